@@ -1,10 +1,26 @@
+import os
 from decouple import config
 
+# CPU yang benar-benar boleh dipakai proses ini (affinity), bukan jumlah CPU host
+def _available_cpus() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
 class Settings:
     DATABASE_URL: str = config("DATABASE_URL")
+    DB_POOL_SIZE: int = config("DB_POOL_SIZE", default=20, cast=int)
+    DB_MAX_OVERFLOW: int = config("DB_MAX_OVERFLOW", default=20, cast=int)
+    DB_POOL_RECYCLE: int = config("DB_POOL_RECYCLE", default=1800, cast=int)
     SECRET_KEY: str = config("SECRET_KEY")
     ALGORITHM: str = config("ALGORITHM", default="HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = config("ACCESS_TOKEN_EXPIRE_MINUTES", default=30, cast=int)
+    ARGON2_TIME_COST: int = config("ARGON2_TIME_COST", default=3, cast=int)
+    ARGON2_MEMORY_COST: int = config("ARGON2_MEMORY_COST", default=65536, cast=int)
+    ARGON2_PARALLELISM: int = config("ARGON2_PARALLELISM", default=4, cast=int)
+    ARGON2_MAX_CONCURRENCY: int = max(1, config(
+        "ARGON2_MAX_CONCURRENCY", default=_available_cpus() // ARGON2_PARALLELISM, cast=int
+    ))
     
     GOOGLE_CLIENT_ID: str = config("GOOGLE_CLIENT_ID")
     GOOGLE_CLIENT_SECRET: str = config("GOOGLE_CLIENT_SECRET")
@@ -1,22 +1,38 @@
+import asyncio
+import logging
 import os
+import anyio
+import httpx
 from dotenv import load_dotenv
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.middleware.sessions import SessionMiddleware
+from fastapi.responses import ORJSONResponse
 
-from .database import engine
-from .models import user
+from .database import Base, engine
+from .middleware import OAuthSessionMiddleware
+from .models import revoked_token, user  # noqa: F401  daftarkan tabel ke Base.metadata
 from .routers import auth
+from .utils.auth import (
+    REVOKED_TOKENS_PURGE_EVERY,
+    REVOKED_TOKENS_REFRESH_SECONDS,
+    purge_expired_revoked_tokens,
+    refresh_revoked_tokens,
+)
 
 load_dotenv()
 
-user.Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
+
+# skema dikelola lewat Alembic (alembic upgrade head),
+# create_all hanya untuk development lokal
+if os.getenv("AUTO_CREATE_TABLES") == "1":
+    Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="FastAPI Auth with Google OAuth", version="1.0.0")
+app = FastAPI(title="FastAPI Auth with Google OAuth", version="1.0.0", default_response_class=ORJSONResponse)
 
-# pasang SessionMiddleware dulu
-app.add_middleware(SessionMiddleware, secret_key=os.getenv("SESSION_SECRET_KEY", "default_secret"))
+# pasang SessionMiddleware dulu, hanya aktif untuk route Google OAuth
+app.add_middleware(OAuthSessionMiddleware, secret_key=os.getenv("SESSION_SECRET_KEY", "default_secret"))
 
 # pasang middleware CORS
 app.add_middleware(
@@ -30,6 +46,43 @@ app.add_middleware(
 # router autentikasi
 app.include_router(auth.router)
 
+# ambil OIDC discovery document Google sekali saat startup,
+# supaya login Google pertama tidak perlu fetch lagi
+@app.on_event("startup")
+async def warm_google_oauth():
+    try:
+        await auth.get_google_oauth().load_server_metadata()
+    except httpx.HTTPError:
+        # gagal di sini tidak fatal, metadata akan diambil saat login Google pertama
+        pass
+
+@app.on_event("shutdown")
+async def close_google_transport():
+    await auth.google_transport.close_pool()
+
+# sinkronkan daftar token yang dicabut (termasuk dari worker lain) setiap beberapa detik
+# dan sesekali bersihkan baris yang tokennya sudah expired
+async def refresh_revoked_tokens_loop():
+    refreshes = 0
+    while True:
+        try:
+            await anyio.to_thread.run_sync(refresh_revoked_tokens)
+            refreshes += 1
+            if refreshes % REVOKED_TOKENS_PURGE_EVERY == 0:
+                await anyio.to_thread.run_sync(purge_expired_revoked_tokens)
+        except Exception:
+            # pakai daftar terakhir dan coba lagi nanti, task ini tidak boleh berhenti
+            logger.exception("Gagal memuat ulang revoked_tokens")
+        await asyncio.sleep(REVOKED_TOKENS_REFRESH_SECONDS)
+
+@app.on_event("startup")
+async def start_revoked_tokens_refresh():
+    app.state.revoked_tokens_task = asyncio.create_task(refresh_revoked_tokens_loop())
+
+@app.on_event("shutdown")
+async def stop_revoked_tokens_refresh():
+    app.state.revoked_tokens_task.cancel()
+
 @app.get("/")
 def read_root():
     return {"message": "FastAPI Auth Backend is running!"}
@@ -0,0 +1,17 @@
+from starlette.middleware.sessions import SessionMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+# session cookie hanya dipakai untuk menyimpan state Google OAuth,
+# jadi request lain (/auth/me, /auth/login, dst) tidak perlu decode/sign cookie
+class OAuthSessionMiddleware:
+    def __init__(self, app: ASGIApp, secret_key: str, path_prefix: str = "/auth/google"):
+        self.app = app
+        self.session_app = SessionMiddleware(app, secret_key=secret_key)
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http" and scope["path"].startswith(self.path_prefix):
+            await self.session_app(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
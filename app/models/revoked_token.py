@@ -0,0 +1,9 @@
+from sqlalchemy import Column, String, DateTime
+from ..database import Base
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String, primary_key=True)
+    # baris ini hanya relevan sampai token aslinya expired
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
\ No newline at end of file
@@ -1,4 +1,6 @@
 from datetime import timedelta
+from functools import lru_cache
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
@@ -12,25 +14,59 @@ from ..schemas.user import UserCreate, User as UserSchema, Token, UserLogin
 from ..utils.auth import (
     verify_password, 
     get_password_hash, 
+    password_needs_rehash,
     create_access_token,
-    get_current_user
+    get_current_user,
+    invalidate_token,
+    invalidate_user,
+    revoke_token,
+    optional_security
 )
 from ..config import settings
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
-# OAuth setup
-oauth = OAuth()
-oauth.register(
-    name='google',
-    client_id=settings.GOOGLE_CLIENT_ID,
-    client_secret=settings.GOOGLE_CLIENT_SECRET,
-    server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
-    client_kwargs={
-        'scope': 'openid email profile'
-    }
+# masa berlaku access token, dihitung sekali dari settings
+ACCESS_TOKEN_EXPIRES = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+
+# authlib membuat dan menutup AsyncOAuth2Client baru di setiap pemanggilan,
+# jadi yang dibagi adalah transport-nya: close dari client diabaikan supaya
+# koneksi TLS/HTTP2 ke Google tetap dipakai ulang antar login
+class SharedTransport(httpx.AsyncHTTPTransport):
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def aclose(self):
+        pass
+
+    async def close_pool(self):
+        await super().aclose()
+
+google_transport = SharedTransport(
+    http2=True,
+    limits=httpx.Limits(max_keepalive_connections=20),
 )
 
+# OAuth setup, didaftarkan sekali saat pertama kali dibutuhkan
+@lru_cache
+def get_google_oauth():
+    oauth = OAuth()
+    oauth.register(
+        name='google',
+        client_id=settings.GOOGLE_CLIENT_ID,
+        client_secret=settings.GOOGLE_CLIENT_SECRET,
+        server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
+        client_kwargs={
+            'scope': 'openid email profile',
+            'transport': google_transport,
+            'timeout': 10.0,
+        }
+    )
+    return oauth.google
+
 @router.post("/register", response_model=UserSchema)
 def register(user: UserCreate, db: Session = Depends(get_db)):
     # Check if user already exists
@@ -57,28 +93,35 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
 def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
     user = db.query(User).filter(User.email == user_credentials.email).first()
     
-    if not user or not verify_password(user_credentials.password, user.hashed_password):
+    # verifikasi tetap dijalankan walau user tidak ada, supaya waktunya tidak membocorkan email terdaftar
+    hashed_password = user.hashed_password if user else None
+    if not verify_password(user_credentials.password, hashed_password) or not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    # migrasi hash bcrypt lama ke Argon2id saat user berhasil login
+    if password_needs_rehash(user.hashed_password):
+        user.hashed_password = get_password_hash(user_credentials.password)
+        db.commit()
+        invalidate_user(user.email)
+    
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data={"sub": user.email}, expires_delta=ACCESS_TOKEN_EXPIRES
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/google")
 async def google_login(request: Request):
     redirect_uri = settings.GOOGLE_REDIRECT_URI
-    return await oauth.google.authorize_redirect(request, redirect_uri)
+    return await get_google_oauth().authorize_redirect(request, redirect_uri)
 
 @router.get("/google/callback")
 async def google_callback(request: Request, db: Session = Depends(get_db)):
     try:
-        token = await oauth.google.authorize_access_token(request)
+        token = await get_google_oauth().authorize_access_token(request)
         user_info = token.get('userinfo')
         
         if not user_info:
@@ -108,11 +151,11 @@ async def google_callback(request: Request, db: Session = Depends(get_db)):
                 user.google_id = user_info['sub']
                 user.avatar_url = user_info.get('picture')
                 db.commit()
+                invalidate_user(user.email)
         
         # Create access token
-        access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
-            data={"sub": user.email}, expires_delta=access_token_expires
+            data={"sub": user.email}, expires_delta=ACCESS_TOKEN_EXPIRES
         )
         
         # Return token (dalam implementasi nyata, redirect ke frontend dengan token)
@@ -129,5 +172,8 @@ def get_current_user_info(current_user: User = Depends(get_current_user)):
     return current_user
 
 @router.post("/logout")
-def logout():
+def logout(token: Optional[str] = Depends(optional_security), db: Session = Depends(get_db)):
+    if token is not None:
+        revoke_token(db, token)
+        invalidate_token(token)
     return {"message": "Successfully logged out"}
\ No newline at end of file
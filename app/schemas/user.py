@@ -1,28 +1,30 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
 from typing import Optional
 from datetime import datetime
 
+# batas panjang password supaya request dengan password raksasa ditolak sebelum di-hash
+MAX_PASSWORD_LENGTH = 1024
+
 class UserBase(BaseModel):
     email: EmailStr
     full_name: Optional[str] = None
 
 class UserCreate(UserBase):
-    password: str
+    password: str = Field(max_length=MAX_PASSWORD_LENGTH)
 
 class UserLogin(BaseModel):
     email: EmailStr
-    password: str
+    password: str = Field(max_length=MAX_PASSWORD_LENGTH)
 
 class User(UserBase):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     is_active: bool
     google_id: Optional[str] = None
     avatar_url: Optional[str] = None
     created_at: datetime
 
-    class Config:
-        from_attributes = True
-
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -1,64 +1,334 @@
-from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from fastapi import HTTPException, status, Depends
+import anyio
+import bcrypt
+import hashlib
+import jwt
+import orjson
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+from cachetools import TTLCache
+from jwt import InvalidTokenError
+from fastapi import HTTPException, Request, status, Depends
 from fastapi.security import HTTPBearer
+from sqlalchemy import bindparam, delete, select
 from sqlalchemy.orm import Session
-from ..database import get_db
+from ..database import SessionLocal, get_db
+from ..models.revoked_token import RevokedToken
 from ..models.user import User
 from ..config import settings
 
-# untuk hashing password
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# hashing password: Argon2id untuk hash baru, bcrypt hanya untuk verifikasi hash lama
+_password_hasher = PasswordHasher(
+    time_cost=settings.ARGON2_TIME_COST,
+    memory_cost=settings.ARGON2_MEMORY_COST,
+    parallelism=settings.ARGON2_PARALLELISM,
+)
 
-# untuk membaca token dari header Authorization: Bearer
-security = HTTPBearer()
+# hash Argon2 yang berjalan bersamaan, puncak memori ~ _HASH_CONCURRENCY x ARGON2_MEMORY_COST KiB
+_HASH_CONCURRENCY = settings.ARGON2_MAX_CONCURRENCY
+_hash_semaphore = threading.BoundedSemaphore(_HASH_CONCURRENCY)
+
+# hash pengganti saat user tidak ada / tidak punya password, supaya waktu respons login
+# sama dengan kasus password salah dan tidak bisa dipakai menebak email yang terdaftar
+_DUMMY_HASH = _password_hasher.hash("dummy-password")
+
+# batas input bcrypt, byte setelahnya diabaikan oleh algoritmanya
+_MAX_BCRYPT_PW_BYTES = 72
+
+# payload JWT di-(de)serialisasi dengan orjson lewat hook _encode_payload/_decode_payload
+# yang memang disediakan PyJWT untuk di-override; header tetap lewat json bawaan PyJWS
+class OrjsonJWT(jwt.PyJWT):
+    def _encode_payload(self, payload: dict, headers: Optional[dict] = None, json_encoder=None) -> bytes:
+        return orjson.dumps(payload)
+
+    def _decode_payload(self, decoded: dict) -> dict:
+        try:
+            payload = orjson.loads(decoded["payload"])
+        except orjson.JSONDecodeError as e:
+            raise jwt.DecodeError(f"Invalid payload string: {e}")
+        if not isinstance(payload, dict):
+            raise jwt.DecodeError("Invalid payload string: must be a json object")
+        return payload
+
+_jwt = OrjsonJWT()
+
+# parameter JWT yang sama untuk setiap encode/decode,
+# secret di-encode ke bytes sekali di sini, bukan di setiap pemanggilan
+_SIGNING_KEY = settings.SECRET_KEY.encode("utf-8")
+_ALGORITHM = settings.ALGORITHM
+_ALGORITHMS = [_ALGORITHM]
+# klaim sub dan exp wajib ada, dicek langsung oleh PyJWT saat decode
+_DECODE_OPTIONS = {"require": ["sub", "exp"]}
+# masa berlaku default token kalau expires_delta tidak diberikan
+_DEFAULT_EXPIRE_SECONDS = 15 * 60
+
+# exception 401 dibuat sekali dan dipakai ulang, FastAPI hanya membaca atributnya;
+# traceback direset setiap raise supaya tidak menumpuk antar request
+_BEARER_HEADERS = {"WWW-Authenticate": "Bearer"}
+_INVALID_TOKEN_EXC = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Token tidak valid",
+    headers=_BEARER_HEADERS,
+)
+_USER_NOT_FOUND_EXC = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="User tidak ditemukan",
+    headers=_BEARER_HEADERS,
+)
+
+# baca token langsung dari header Authorization: Bearer, tanpa membuat model
+# HTTPAuthorizationCredentials per request. Tetap turunan HTTPBearer supaya
+# skema keamanan (tombol Authorize) di /docs tidak hilang
+class BearerToken(HTTPBearer):
+    async def __call__(self, request: Request) -> Optional[str]:  # type: ignore[override]
+        authorization = request.headers.get("authorization")
+        if authorization and authorization[:7].lower() == "bearer " and len(authorization) > 7:
+            return authorization[7:]
+        if self.auto_error:
+            raise _INVALID_TOKEN_EXC.with_traceback(None)
+        return None
+
+# nama skema tetap "HTTPBearer" seperti sebelumnya, dipakai oleh client hasil generate OpenAPI
+security = BearerToken(scheme_name="HTTPBearer")
+# versi yang tidak wajib, misalnya untuk logout
+optional_security = BearerToken(scheme_name="HTTPBearer", auto_error=False)
+
+# cache hasil verifikasi JWT per token
+_TOKEN_CACHE_TTL = 60
+_token_cache: TTLCache = TTLCache(maxsize=10000, ttl=_TOKEN_CACHE_TTL)
+_token_cache_lock = threading.Lock()
+# verifikasi yang sedang berjalan per token (singleflight)
+_inflight: Dict[bytes, Future] = {}
+_inflight_lock = threading.Lock()
+
+# cache user hasil query per email, dipakai bersama oleh semua token milik user yang sama
+_user_cache: TTLCache = TTLCache(maxsize=5000, ttl=30)
+_user_cache_lock = threading.Lock()
+
+# query user untuk get_current_user dibangun sekali, email di-bind saat eksekusi
+_USER_BY_EMAIL_STMT = select(User).where(User.email == bindparam("email"))
+
+# jti token yang sudah dicabut (logout), dimuat ulang berkala dari tabel revoked_tokens
+# supaya verifikasi cukup cek set di memori tanpa query per request
+_revoked_jtis: set = set()
+# jti yang dicabut di worker ini (jti -> exp), selalu digabung saat refresh supaya
+# logout yang commit di tengah refresh tidak hilang ketika set-nya diganti
+_local_revoked_jtis: Dict[str, float] = {}
+_revoked_lock = threading.Lock()
+REVOKED_TOKENS_REFRESH_SECONDS = 5
+# baris revoked_tokens yang sudah expired dihapus setiap sekian kali refresh (~5 menit)
+REVOKED_TOKENS_PURGE_EVERY = 60
+
+# limiter khusus hashing password, dibuat saat pertama dipakai (butuh event loop)
+_hash_limiter: Optional[anyio.CapacityLimiter] = None
 
 
 # verifikasi password saat login
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+# hashed_password None (user tidak ditemukan, atau user Google OAuth tanpa password)
+# tetap menjalankan verifikasi dummy dengan biaya yang sama, lalu selalu False
+def verify_password(plain_password: str, hashed_password: Optional[str]) -> bool:
+    if hashed_password is None:
+        _verify_argon2(plain_password, _DUMMY_HASH)
+        return False
+    if hashed_password.startswith("$argon2"):
+        return _verify_argon2(plain_password, hashed_password)
+    # bcrypt hanya memakai 72 byte pertama, sisanya tidak perlu ikut diproses
+    try:
+        return bcrypt.checkpw(plain_password.encode("utf-8")[:_MAX_BCRYPT_PW_BYTES], hashed_password.encode("utf-8"))
+    except ValueError:
+        # hash tersimpan rusak / bukan bcrypt
+        return False
+
+def _verify_argon2(plain_password: str, hashed_password: str) -> bool:
+    try:
+        with _hash_semaphore:
+            return _password_hasher.verify(hashed_password, plain_password)
+    except (VerificationError, InvalidHashError):
+        return False
 
 # hashing password saat register
-def get_password_hash(password):
-    return pwd_context.hash(password)
+def get_password_hash(password: str) -> str:
+    with _hash_semaphore:
+        return _password_hasher.hash(password)
+
+# hash bcrypt lama atau argon2 dengan parameter lama perlu di-hash ulang setelah login berhasil
+def password_needs_rehash(hashed_password: str) -> bool:
+    if not hashed_password.startswith("$argon2"):
+        return True
+    return _password_hasher.check_needs_rehash(hashed_password)
+
+# versi async untuk dipakai dari endpoint async def: hashing Argon2 dijalankan di thread
+# terpisah supaya event loop tidak terblokir. Endpoint sync (def) sudah jalan di
+# threadpool FastAPI, jadi tetap pakai verify_password / get_password_hash biasa.
+def _get_hash_limiter() -> anyio.CapacityLimiter:
+    global _hash_limiter
+    if _hash_limiter is None:
+        _hash_limiter = anyio.CapacityLimiter(_HASH_CONCURRENCY)
+    return _hash_limiter
+
+async def verify_password_async(plain_password: str, hashed_password: Optional[str]) -> bool:
+    return await anyio.to_thread.run_sync(
+        verify_password, plain_password, hashed_password, limiter=_get_hash_limiter()
+    )
+
+async def get_password_hash_async(password: str) -> str:
+    return await anyio.to_thread.run_sync(get_password_hash, password, limiter=_get_hash_limiter())
 
 # buat JWT access token
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+# exp ditulis langsung sebagai NumericDate (detik epoch), tanpa membuat objek datetime
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=15))
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    expires_in = int(expires_delta.total_seconds()) if expires_delta else _DEFAULT_EXPIRE_SECONDS
+    to_encode["exp"] = int(time.time()) + expires_in
+    to_encode["jti"] = uuid.uuid4().hex
+    encoded_jwt = _jwt.encode(to_encode, _SIGNING_KEY, algorithm=_ALGORITHM)
     return encoded_jwt
 
+# key cache = digest sha256, token asli tidak ikut disimpan di memori
+def _token_hash(token: str) -> bytes:
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
 # verifikasi dan decode token
-def verify_token(token: str):
+def verify_token(token: str) -> str:
+    return _verify_token(token, _token_hash(token))
+
+# hasil verifikasi (email, waktu kedaluwarsa) di-cache per token,
+# token yang tidak valid tidak pernah masuk cache karena raise duluan
+def _verify_token(token: str, key: bytes) -> str:
+    now = time.time()
+    with _token_cache_lock:
+        cached = _token_cache.get(key)
+    if cached is not None:
+        email, jti, expires_at = cached
+        if expires_at > now and jti not in _revoked_jtis:
+            return email
+        with _token_cache_lock:
+            _token_cache.pop(key, None)
+
+    # request bersamaan dengan token yang sama menunggu hasil verifikasi pertama,
+    # bukan ikut decode semua sebelum cache terisi
+    with _inflight_lock:
+        waiting = _inflight.get(key)
+        if waiting is None:
+            future: Future = Future()
+            _inflight[key] = future
+    if waiting is not None:
+        return waiting.result()
+
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Token tidak valid",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
+        email = _decode_token(token, key, now)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(email)
         return email
-    except JWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token tidak valid",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+def _decode_token(token: str, key: bytes, now: float) -> str:
+    try:
+        payload = _jwt.decode(token, _SIGNING_KEY, algorithms=_ALGORITHMS, options=_DECODE_OPTIONS)
+    except InvalidTokenError:
+        raise _INVALID_TOKEN_EXC.with_traceback(None) from None
+    jti = payload.get("jti")
+    if jti is not None and jti in _revoked_jtis:
+        raise _INVALID_TOKEN_EXC.with_traceback(None)
+    email = payload["sub"]
+    # python-jose dulu menolak sub yang bukan string, PyJWT 2.8 tidak
+    if not isinstance(email, str):
+        raise _INVALID_TOKEN_EXC.with_traceback(None)
+
+    # entry tidak boleh hidup lebih lama dari klaim exp token itu sendiri
+    expires_at = min(payload["exp"], now + _TOKEN_CACHE_TTL)
+    if expires_at > now:
+        with _token_cache_lock:
+            _token_cache[key] = (email, jti, expires_at)
+    return email
+
+# hapus token dari cache, dipanggil saat logout
+def invalidate_token(token: str) -> None:
+    key = _token_hash(token)
+    with _token_cache_lock:
+        _token_cache.pop(key, None)
+
+# cabut token saat logout: jti dicatat sampai token itu sendiri expired
+def revoke_token(db: Session, token: str) -> None:
+    try:
+        payload = _jwt.decode(token, _SIGNING_KEY, algorithms=_ALGORITHMS, options=_DECODE_OPTIONS)
+    except InvalidTokenError:
+        return
+    jti = payload.get("jti")
+    if jti is None:
+        return
+    db.merge(RevokedToken(jti=jti, expires_at=datetime.fromtimestamp(payload["exp"], timezone.utc)))
+    db.commit()
+    with _revoked_lock:
+        _local_revoked_jtis[jti] = payload["exp"]
+        _revoked_jtis.add(jti)
+
+# muat ulang daftar jti yang dicabut, dipanggil berkala dari background task
+def refresh_revoked_tokens() -> None:
+    global _revoked_jtis
+    db = SessionLocal()
+    try:
+        jtis = db.execute(
+            select(RevokedToken.jti).where(RevokedToken.expires_at > datetime.now(timezone.utc))
+        ).scalars().all()
+    finally:
+        db.close()
+    now = time.time()
+    with _revoked_lock:
+        for jti, exp in list(_local_revoked_jtis.items()):
+            if exp <= now:
+                del _local_revoked_jtis[jti]
+        _revoked_jtis = set(jtis) | _local_revoked_jtis.keys()
+
+# hapus jti yang tokennya sudah expired, barisnya tidak dibutuhkan lagi
+def purge_expired_revoked_tokens() -> None:
+    db = SessionLocal()
+    try:
+        db.execute(delete(RevokedToken).where(RevokedToken.expires_at <= datetime.now(timezone.utc)))
+        db.commit()
+    finally:
+        db.close()
+
+# hapus user dari cache, dipanggil setelah data user berubah
+def invalidate_user(email: str) -> None:
+    with _user_cache_lock:
+        _user_cache.pop(email, None)
 
 # ambil user saat akses endpoint yang butuh login
-def get_current_user(token: str = Depends(security), db: Session = Depends(get_db)):
-    email = verify_token(token.credentials)
-    user = db.query(User).filter(User.email == email).first()
+def get_current_user(request: Request, token: str = Depends(security), db: Session = Depends(get_db)) -> User:
+    # sudah di-resolve sebelumnya di request yang sama
+    user = getattr(request.state, "user", None)
+    if user is not None:
+        return user
+
+    # token tetap diverifikasi dulu supaya token expired tidak lolos lewat cache user
+    key = _token_hash(token)
+    email = _verify_token(token, key)
+    with _user_cache_lock:
+        cached = _user_cache.get(email)
+    if cached is not None:
+        # pasang lagi ke session tanpa query, objek di cache tetap detached
+        user = db.merge(cached, load=False)
+        request.state.user = user
+        return user
+
+    user = db.execute(_USER_BY_EMAIL_STMT, {"email": email}).scalar_one_or_none()
     if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User tidak ditemukan",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        raise _USER_NOT_FOUND_EXC.with_traceback(None)
+    # yang disimpan di cache versi detached, request ini memakai salinan yang terpasang di session
+    db.expunge(user)
+    with _user_cache_lock:
+        _user_cache[email] = user
+    user = db.merge(user, load=False)
+    request.state.user = user
     return user
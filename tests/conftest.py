@@ -0,0 +1,46 @@
+import os
+import tempfile
+
+# settings dibaca saat import app, jadi env untuk test harus diset lebih dulu
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/test.db"
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("GOOGLE_CLIENT_ID", "test-client-id")
+os.environ.setdefault("GOOGLE_CLIENT_SECRET", "test-client-secret")
+os.environ.setdefault("GOOGLE_REDIRECT_URI", "http://localhost:8000/auth/google/callback")
+# parameter Argon2 murah supaya test tidak lambat
+os.environ["ARGON2_TIME_COST"] = "1"
+os.environ["ARGON2_MEMORY_COST"] = "1024"
+os.environ["ARGON2_PARALLELISM"] = "1"
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.database import Base, engine
+from app.main import app
+from app.utils import auth as auth_utils
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    auth_utils._token_cache.clear()
+    auth_utils._user_cache.clear()
+    auth_utils._revoked_jtis.clear()
+    auth_utils._local_revoked_jtis.clear()
+    yield
+
+
+@pytest.fixture
+def client():
+    # tanpa context manager: event startup (fetch metadata Google, loop refresh) tidak dijalankan
+    return TestClient(app)
+
+
+@pytest.fixture
+def access_token(client):
+    user = {"email": "user@example.com", "password": "password123"}
+    client.post("/auth/register", json={**user, "full_name": "User"})
+    response = client.post("/auth/login", json=user)
+    return response.json()["access_token"]
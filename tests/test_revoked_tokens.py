@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+from app.database import SessionLocal
+from app.models.revoked_token import RevokedToken
+from app.utils import auth as auth_utils
+
+
+def test_logout_revokes_token(client, access_token):
+    headers = {"Authorization": f"Bearer {access_token}"}
+    assert client.get("/auth/me", headers=headers).status_code == 200
+
+    assert client.post("/auth/logout", headers=headers).status_code == 200
+    assert client.get("/auth/me", headers=headers).status_code == 401
+
+    # tetap ditolak setelah daftar dimuat ulang dari database
+    auth_utils.refresh_revoked_tokens()
+    assert client.get("/auth/me", headers=headers).status_code == 401
+
+
+def test_revoke_during_refresh_keeps_jti(monkeypatch):
+    token = auth_utils.create_access_token({"sub": "user@example.com"})
+    jti = auth_utils._jwt.decode(token, options={"verify_signature": False})["jti"]
+
+    # logout di worker yang sama commit tepat setelah SELECT refresh selesai,
+    # sebelum set hasil refresh dipasang
+    class SessionWithLogout:
+        def __init__(self):
+            self._db = SessionLocal()
+
+        def execute(self, statement):
+            result = self._db.execute(statement).scalars().all()
+            logout_db = SessionLocal()
+            try:
+                auth_utils.revoke_token(logout_db, token)
+            finally:
+                logout_db.close()
+            return _Rows(result)
+
+        def close(self):
+            self._db.close()
+
+    monkeypatch.setattr(auth_utils, "SessionLocal", SessionWithLogout)
+    auth_utils.refresh_revoked_tokens()
+
+    assert jti in auth_utils._revoked_jtis
+
+
+def test_purge_removes_only_expired_rows():
+    now = datetime.now(timezone.utc)
+    db = SessionLocal()
+    try:
+        db.add_all([
+            RevokedToken(jti="expired", expires_at=now - timedelta(minutes=1)),
+            RevokedToken(jti="active", expires_at=now + timedelta(minutes=30)),
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+    auth_utils.purge_expired_revoked_tokens()
+
+    db = SessionLocal()
+    try:
+        remaining = db.execute(select(RevokedToken.jti)).scalars().all()
+    finally:
+        db.close()
+    assert remaining == ["active"]
+
+
+class _Rows:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self._rows
@@ -0,0 +1,65 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException
+
+from app.utils import auth as auth_utils
+
+THREADS = 30
+
+
+def _verify_concurrently(token):
+    barrier = threading.Barrier(THREADS)
+
+    def verify():
+        barrier.wait()
+        try:
+            return auth_utils.verify_token(token)
+        except HTTPException as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        return list(pool.map(lambda _: verify(), range(THREADS)))
+
+
+def _count_decodes(monkeypatch):
+    calls = []
+    decode_token = auth_utils._decode_token
+
+    # decode diperlambat supaya semua thread sempat menunggu verifikasi yang sama
+    def slow_decode(*args):
+        calls.append(1)
+        time.sleep(0.05)
+        return decode_token(*args)
+
+    monkeypatch.setattr(auth_utils, "_decode_token", slow_decode)
+    return calls
+
+
+def test_concurrent_valid_token_decoded_once(monkeypatch):
+    calls = _count_decodes(monkeypatch)
+    token = auth_utils.create_access_token({"sub": "user@example.com"})
+
+    results = _verify_concurrently(token)
+
+    assert results == ["user@example.com"] * THREADS
+    assert len(calls) == 1
+
+
+def test_concurrent_invalid_token_all_rejected(monkeypatch):
+    _count_decodes(monkeypatch)
+
+    results = _verify_concurrently("not-a-jwt")
+
+    assert all(isinstance(r, HTTPException) and r.status_code == 401 for r in results)
+    assert not auth_utils._inflight
+
+
+def test_non_string_sub_rejected():
+    token = auth_utils.create_access_token({"sub": 123})
+
+    with pytest.raises(HTTPException) as exc_info:
+        auth_utils.verify_token(token)
+    assert exc_info.value.status_code == 401